@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import copy
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import blackhole
+
+# Pure-Python star loops above this size take minutes per step; --full runs them anyway
+PYTHON_STAR_LIMIT = 1000
+
+# blackhole reads these from the working directory's sim_config.json (a scene
+# there would rebuild its lattice on every frame_assembly repeat), so they are
+# pinned, by config key, to keep results comparable between machines
+BENCH_CONFIG = {'gravity_solver': 'direct', 'barnes_hut_theta': 0.5, 'integrator': 'euler',
+                'collision_radius': 0.0, 'scene': []}
+
+def pin_config():
+    for key, value in BENCH_CONFIG.items():
+        setattr(blackhole, key.upper(), value)
+
+def time_case(setup, run, warmup, repeat):
+    # setup() builds fresh state outside the timed region so every repeat
+    # measures the same work
+    for _ in range(warmup):
+        run(setup())
+    samples = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        samples.append(time.perf_counter() - start)
+    return {
+        'min_s': min(samples),
+        'median_s': statistics.median(samples),
+        'mean_s': statistics.fmean(samples),
+        'repeats': repeat
+    }
+
+def seeded_stars(num_stars, width, height, seed):
+    random.seed(seed)
+    return blackhole.create_stars(num_stars, width, height, width // 2, height // 2)
+
+# Two extra black holes and a ring of fixed masses; lattice sampling should make
+# the kick cost independent of how many there are
+BENCH_SCENE = ([{'type': 'black_hole', 'x': 0.2, 'y': 0.5, 'mass': 2e6}, {'type': 'black_hole', 'x': 0.8, 'y': 0.5, 'mass': 2e6}] +
+               [{'type': 'mass', 'x': 0.1 * i, 'y': 0.2, 'mass': 5e5} for i in range(1, 10)])
+
+def bench_star_update(args):
+    width, height = 200, 100
+    scene_field = blackhole.build_scene_field(BENCH_SCENE, width, height)
+    cases = []
+    for num_stars in (1, 100, 1000, 10000):
+        base = seeded_stars(num_stars, width, height, args.seed)
+        engines = [('python', lambda base=base: copy.deepcopy(base))]
+        if blackhole.np is not None:
+            engines.append(('numpy', lambda base=base: blackhole.stars_to_arrays(base)))
+        for engine, setup in engines:
+            for solver in ('direct', 'barnes_hut'):
+                params = {'stars': num_stars, 'engine': engine, 'solver': solver}
+                if engine == 'python' and solver == 'direct' and num_stars > PYTHON_STAR_LIMIT and not args.full:
+                    cases.append(('update_stars', params, None))
+                    continue
+                run = lambda stars, solver=solver: blackhole.update_stars(stars, width // 2, height // 2, width, height,
+                                                                          solver=solver)
+                cases.append(('update_stars', params, (setup, run)))
+        # A fresh spatial hash each repeat, so this is the full build plus pair search
+        collide = lambda stars: blackhole.merge_collisions(stars, blackhole.create_spatial_hash(), 0.5)
+        cases.append(('merge_collisions', {'stars': num_stars, 'radius': 0.5}, (engines[-1][1], collide)))
+        kick = lambda stars: blackhole.apply_scene_kick(stars, scene_field, 0.01)
+        cases.append(('scene_kick', {'stars': num_stars, 'sources': len(BENCH_SCENE)}, (engines[-1][1], kick)))
+    return cases
+
+def bench_create_grid(args):
+    cases = []
+    for width, height in ((40, 20), (100, 50), (200, 100)):
+        for show_background in (True, False):
+            def setup(width=width, height=height):
+                random.seed(args.seed)
+                background_grid = blackhole.create_background_grid(width, height)
+                return background_grid, blackhole.create_background_layer(background_grid)
+
+            def run(state, width=width, height=height, show_background=show_background):
+                background_grid, background_layer = state
+                blackhole.create_grid(width, height, background_grid, 0, {}, 0, show_background, background_layer)
+
+            cases.append(('create_grid', {'width': width, 'height': height, 'background': show_background}, (setup, run)))
+    return cases
+
+def bench_placement(args):
+    # Widths cover the small, medium and large black hole and both star sprites;
+    # density shading is timed at a star count where sprites stop being useful
+    cases = []
+    for width in (60, 80, 120):
+        height = width // 2
+        positions = [(s['x'], s['y']) for s in seeded_stars(1000, width, height, args.seed)]
+
+        def setup(width=width, height=height):
+            return [[' '] * width for _ in range(height)]
+
+        def run_black_hole(grid, width=width, height=height):
+            for _ in range(1000):
+                blackhole.place_black_hole(grid, width // 2, height // 2, width)
+
+        def run_stars(grid, width=width, positions=positions):
+            for x, y in positions:
+                blackhole.place_star(grid, x, y, width)
+
+        cases.append(('place_black_hole', {'width': width, 'calls': 1000}, (setup, run_black_hole)))
+        cases.append(('place_star', {'width': width, 'calls': len(positions)}, (setup, run_stars)))
+
+        stars = seeded_stars(10000, width, height, args.seed)
+        if blackhole.np is not None:
+            stars = blackhole.stars_to_arrays(stars)
+
+        def run_density(grid, width=width, height=height, stars=stars):
+            blackhole.place_density(grid, stars, width, height)
+
+        cases.append(('place_density', {'width': width, 'stars': 10000}, (setup, run_density)))
+    return cases
+
+def bench_frame_assembly(args):
+    # A full frame: grid, sprites and the differential renderer writing to a buffer,
+    # once from scratch and once on top of the previous frame
+    cases = []
+    for width, height in ((40, 20), (100, 50), (200, 100)):
+        for redraw in ('full', 'diff'):
+            def setup(width=width, height=height, redraw=redraw):
+                random.seed(args.seed)
+                sim = blackhole.create_simulation(100, width, height)
+                renderer = blackhole.create_renderer()
+                if redraw == 'diff':
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        blackhole.render_frame(renderer, blackhole.draw_simulation(sim, True), "")
+                    blackhole.step_simulation(sim)
+                return sim, renderer
+
+            def run(state):
+                sim, renderer = state
+                grid = blackhole.draw_simulation(sim, True)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    blackhole.render_frame(renderer, grid, "Stars: 100/100 | Frame: 1")
+
+            cases.append(('frame_assembly', {'width': width, 'height': height, 'redraw': redraw}, (setup, run)))
+    return cases
+
+BENCHMARKS = {
+    'update_stars': bench_star_update,
+    'create_grid': bench_create_grid,
+    'placement': bench_placement,
+    'frame_assembly': bench_frame_assembly
+}
+
+def case_key(result):
+    return result['name'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+def run_benchmarks(args):
+    results = []
+    for group in args.only or BENCHMARKS:
+        for name, params, case in BENCHMARKS[group](args):
+            label = f"{name} {json.dumps(params, sort_keys=True)}"
+            if case is None:
+                print(f"{label}: skipped (use --full)", file=sys.stderr)
+                continue
+            timing = time_case(*case, args.warmup, args.repeat)
+            print(f"{label}: median {timing['median_s'] * 1e3:.3f} ms", file=sys.stderr)
+            results.append({'name': name, 'params': params, **timing})
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': blackhole.np.__version__ if blackhole.np is not None else None,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'config': BENCH_CONFIG,
+            'timestamp': time.time()
+        },
+        'results': results
+    }
+
+def compare(report, baseline, threshold):
+    # Fastest repeats are compared since they carry the least scheduling noise
+    if baseline['meta'].get('config') != report['meta']['config']:
+        print("note: baseline was run with different simulation settings", file=sys.stderr)
+    previous = {case_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        ratio = result['min_s'] / old['min_s'] if old['min_s'] > 0 else float('inf')
+        flag = 'REGRESSION' if ratio > 1 + threshold else 'ok'
+        print(f"{flag:>10}  {ratio:6.2f}x  {case_key(result)}")
+        if flag == 'REGRESSION':
+            regressions.append(case_key(result))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the blackhole physics and rendering hot paths")
+    parser.add_argument('--only', action='append', choices=list(BENCHMARKS), help="run only this group (repeatable)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for star and background generation")
+    parser.add_argument('--warmup', type=int, default=1, help="untimed runs before measuring each case")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case")
+    parser.add_argument('--full', action='store_true', help=f"also run the pure-Python direct sum above {PYTHON_STAR_LIMIT} stars")
+    parser.add_argument('--output', help="write results as JSON to this file instead of stdout")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against a stored JSON result and flag regressions")
+    parser.add_argument('--threshold', type=float, default=0.20, help="allowed slowdown before a case is flagged (default 0.20)")
+    args = parser.parse_args(argv)
+
+    pin_config()
+    report = run_benchmarks(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
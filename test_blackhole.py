@@ -0,0 +1,230 @@
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import blackhole
+
+
+def make_grid(frame_count, width=40, height=20):
+    grid = [[' '] * width for _ in range(height)]
+    grid[frame_count % height][frame_count % width] = '\033[0m@'
+    return grid
+
+
+def load_config_from(test, config):
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    path = os.path.join(tmp.name, 'sim_config.json')
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    with mock.patch.object(blackhole, 'CONFIG_FILE', path), contextlib.redirect_stdout(io.StringIO()):
+        return blackhole.load_config()
+
+
+class ConfigTest(unittest.TestCase):
+    def test_non_positive_frame_rate_falls_back_to_default(self):
+        self.assertEqual(load_config_from(self, {'target_fps': 0})['target_fps'], 30)
+        self.assertEqual(load_config_from(self, {'target_fps': 12})['target_fps'], 12)
+
+    def test_non_positive_opening_angle_falls_back_to_default(self):
+        self.assertEqual(load_config_from(self, {'barnes_hut_theta': -1})['barnes_hut_theta'], 0.5)
+
+
+class FrameServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmp.name, 'frames.sock')
+        self.server = blackhole.start_frame_server(self.address)
+
+    def tearDown(self):
+        blackhole.stop_frame_server(self.server)
+        self.tmp.cleanup()
+
+    def test_viewers_closing_during_broadcast(self):
+        # Viewers that reset their connection while frames are going out must
+        # not take the server thread down with them
+        stop = threading.Event()
+
+        def publish():
+            frame_count = 0
+            while not stop.is_set():
+                blackhole.publish_frame(self.server, frame_count, make_grid(frame_count), "status")
+                frame_count += 1
+                time.sleep(0.001)
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        try:
+            for _ in range(60):
+                viewer = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                viewer.connect(self.address)
+                time.sleep(0.005)
+                viewer.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                viewer.close()
+            time.sleep(0.1)
+            self.assertTrue(self.server['thread'].is_alive())
+
+            # A viewer connecting afterwards still starts from a keyframe
+            viewer = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            viewer.connect(self.address)
+            viewer.settimeout(2)
+            buffer = bytearray()
+            state = {'grid': None, 'frame': 0, 'status': ''}
+            deadline = time.time() + 2
+            while state['grid'] is None and time.time() < deadline:
+                buffer += viewer.recv(65536)
+                blackhole.read_frames(buffer, state)
+            viewer.close()
+            self.assertIsNotNone(state['grid'])
+        finally:
+            stop.set()
+            publisher.join()
+
+    def test_drop_client_is_idempotent(self):
+        viewer = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        viewer.connect(self.address)
+        deadline = time.time() + 2
+        while not self.server['clients'] and time.time() < deadline:
+            time.sleep(0.01)
+        client = self.server['clients'][0]
+        blackhole.drop_client(self.server, client)
+        blackhole.drop_client(self.server, client)
+        self.assertEqual(self.server['clients'], [])
+        viewer.close()
+
+    def test_bind_failure_stops_the_recorder(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        threads = threading.active_count()
+        with mock.patch.object(blackhole, 'CHECKPOINT_FILE', os.path.join(tmp.name, 'checkpoint.bin')), \
+                contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(OSError):
+                blackhole.simulate_orbits(5, 10, size=(40, 20), seed=1, record_path=os.path.join(tmp.name, 'run.cast'),
+                                          serve_address=os.path.join(tmp.name, 'missing', 'frames.sock'))
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_addresses(self):
+        self.assertEqual(blackhole.parse_address('frames.sock'), (socket.AF_UNIX, 'frames.sock'))
+        self.assertEqual(blackhole.parse_address('7777'), (socket.AF_INET, ('127.0.0.1', 7777)))
+        self.assertEqual(blackhole.parse_address('[::1]:7777'), (socket.AF_INET6, ('::1', 7777)))
+        with self.assertRaises(ValueError):
+            blackhole.parse_address('0.0.0.0:7777')
+
+
+class RecorderTest(unittest.TestCase):
+    @unittest.skipUnless(os.path.exists('/dev/full'), "needs /dev/full")
+    def test_write_error_stops_recording_without_blocking(self):
+        recorder = blackhole.start_recorder('/dev/full', 40, 20)
+        # The writer only fails once its buffer is flushed, so keep feeding it
+        deadline = time.time() + 5
+        while recorder['error'] is None and time.time() < deadline:
+            blackhole.record_event(recorder, 'o', 'x' * 4096)
+        self.assertIsNotNone(recorder['error'])
+        # Once failed, events are accepted so the renderer keeps sending deltas
+        for _ in range(blackhole.RECORD_QUEUE_SIZE * 2):
+            self.assertTrue(blackhole.record_event(recorder, 'o', 'x'))
+        blackhole.stop_recorder(recorder)
+        self.assertFalse(recorder['thread'].is_alive())
+
+
+
+class SchedulerTest(unittest.TestCase):
+    def test_idle_loop_sleeps_until_the_next_step(self):
+        # Frame deadline passed, nothing new to draw: sleep to the step at 25% speed
+        # (0.4 s per step) instead of waking immediately
+        self.assertEqual(blackhole.scheduler_wake_time(10.4, 9.0, False), 10.4)
+
+    def test_pending_frame_wakes_for_its_deadline(self):
+        self.assertEqual(blackhole.scheduler_wake_time(10.4, 10.03, True), 10.03)
+
+
+class BarnesHutTest(unittest.TestCase):
+    @unittest.skipIf(blackhole.np is None, "needs NumPy")
+    def test_vectorised_walk_matches_scalar_walk(self):
+        rng = random.Random(7)
+        n = 500
+        xs = [rng.uniform(0, 200) for _ in range(n)]
+        ys = [rng.uniform(0, 60) for _ in range(n)]
+        masses = [rng.uniform(0.5, 2) for _ in range(n)]
+        bodies = list(range(0, n, 3))
+        tree = blackhole.build_quadtree(xs, ys, masses, bodies)
+        ax, ay = blackhole.quadtree_accelerations(tree, xs, ys, masses, bodies, 0.5)
+        for k, i in enumerate(bodies):
+            ex, ey = blackhole.quadtree_acceleration(tree, xs, ys, masses, xs[i], ys[i], 0.5)
+            self.assertAlmostEqual(ax[k], ex, places=12)
+            self.assertAlmostEqual(ay[k], ey, places=12)
+
+
+class NumpyEngineTest(unittest.TestCase):
+    @unittest.skipIf(blackhole.np is None, "needs NumPy")
+    def test_star_at_the_centre_is_captured_quietly(self):
+        stars = blackhole.stars_to_arrays([{'x': 50.0, 'y': 25.0, 'vx': 0.0, 'vy': 0.0, 'mass': 1.0, 'active': True},
+                                           {'x': 10.0, 'y': 5.0, 'vx': 0.0, 'vy': 0.0, 'mass': 1.0, 'active': True}])
+        with blackhole.np.errstate(all='raise'):
+            blackhole.update_stars(stars, 50, 25, 100, 50)
+        self.assertEqual(stars['active'].tolist(), [False, True])
+
+
+class SceneFieldTest(unittest.TestCase):
+    def test_lattice_pull_within_one_percent(self):
+        scene = [{'type': 'black_hole', 'x': 0.25, 'y': 0.5, 'mass': 3e6}, {'type': 'mass', 'x': 0.75, 'y': 0.25}]
+        field = blackhole.build_scene_field(scene, 80, 30)
+        rng = random.Random(3)
+        for _ in range(5000):
+            x, y = rng.uniform(0, 80), rng.uniform(0, 30)
+            ax, ay, _, _ = blackhole.sample_scene(field, x, y)
+            ex, ey, _, _ = blackhole.scene_terms(field['sources'], x, y)
+            # Relative to the individual pulls, since they cancel between the sources
+            scale = sum(math.hypot(*blackhole.scene_terms([source], x, y)[:2]) for source in field['sources'])
+            self.assertLess(math.hypot(ax - ex, ay - ey), 0.01 * scale)
+
+
+class CheckpointReplayTest(unittest.TestCase):
+    def test_replay_across_window_drag(self):
+        # Widen the terminal by two columns on each of frames 5-9, as when dragging
+        # its edge, and check every frame rebuilds exactly from the checkpoints
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        frames = {}
+        step_simulation = blackhole.step_simulation
+
+        def recording_step(sim, *args, **kwargs):
+            active_count = step_simulation(sim, *args, **kwargs)
+            frames[sim['frame_count']] = snapshot(sim)
+            return active_count
+
+        def dragged_size():
+            return 60 + 2 * min(max(len(frames) - 4, 0), 5), 30
+
+        def snapshot(sim):
+            return sim['width'], sim['height'], blackhole.star_columns(sim['stars']), [row[:] for row in sim['background_grid']]
+
+        checkpoint_file = mock.patch.object(blackhole, 'CHECKPOINT_FILE', os.path.join(tmp.name, 'checkpoint.bin'))
+        with checkpoint_file, \
+                mock.patch.object(blackhole, 'STATS_DB', os.path.join(tmp.name, 'stats.db')), \
+                mock.patch.object(blackhole, 'CHECKPOINT_INTERVAL', 1000), \
+                mock.patch.object(blackhole, 'DEFAULT_SPEED', 1000), \
+                mock.patch.object(blackhole, 'get_terminal_size', dragged_size), \
+                mock.patch.object(blackhole, 'step_simulation', recording_step), \
+                contextlib.redirect_stdout(io.StringIO()):
+            blackhole.simulate_orbits(20, 20, seed=1)
+        self.assertEqual(frames[20][0], 70)
+
+        with checkpoint_file:
+            for frame in range(1, 21):
+                _, sim, _ = blackhole.rebuild_frame(frame)
+                self.assertEqual(snapshot(sim), frames[frame], f"frame {frame}")
+
+
+if __name__ == '__main__':
+    unittest.main()